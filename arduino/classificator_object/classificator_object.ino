@@ -17,6 +17,31 @@ const int anguloActivo = 45;
 // Variables para detectar cambios
 bool ultimoModo = HIGH;
 
+// ------- Modo streaming (se alterna enviando 'S' por serie) -------
+// Trama: A5 5A | seq | n | estado | activacion | t0_us (uint32 LE) | periodo_us (uint16 LE)
+//        | datos | checksum
+// Cada muestra ocupa 2 bits (bit0 = SENSOR1 activo, bit1 = SENSOR2 activo),
+// 4 muestras por byte. estado: bit0 = switch en MODO 1, bits1-2 = fase del servo
+// al cerrar la trama. activacion: índice de la muestra en la que se activó el
+// servo (0xFF = ninguna). checksum = XOR de los bytes desde seq hasta el último dato.
+// Si se pierden ranuras de muestreo (p.ej. Serial.write bloqueado) la trama se
+// cierra y la siguiente empieza con su propio t0: nunca se rellenan huecos.
+const unsigned int PERIODO_MUESTREO_US = 1000;  // 1 kHz
+const byte MUESTRAS_POR_TRAMA = 128;            // ~45 bytes cada 128 ms a 9600 baudios
+const byte SIN_ACTIVACION = 0xFF;
+bool streaming = false;
+byte secuenciaTrama = 0;
+byte bufferMuestras[MUESTRAS_POR_TRAMA / 4];
+byte numMuestras = 0;
+bool modoTrama = HIGH;
+byte muestraActivacion = SIN_ACTIVACION;
+unsigned long t0Trama = 0;
+unsigned long ultimoMuestreo = 0;
+
+// Servo no bloqueante para no perder muestras en modo streaming
+unsigned long servoActivadoEn = 0;
+byte faseServo = 0;  // 0 = reposo, 1 = filtrando, 2 = regresando
+
 void setup() {
   pinMode(SENSOR1, INPUT_PULLUP);
   pinMode(SENSOR2, INPUT_PULLUP);
@@ -33,6 +58,7 @@ void setup() {
 }
 
 void loop() {
+  leerComandos();
   bool modo = digitalRead(pinModo);
 
   // Detectar si cambió el modo
@@ -45,6 +71,11 @@ void loop() {
     ultimoModo = modo;
   }
 
+  if (streaming) {
+    loopStreaming(modo);
+    return;
+  }
+
   if (modo == HIGH) {
     // ------- MODO 1: SENSOR1 en LOW y SENSOR2 en HIGH ------
     if (digitalRead(SENSOR1) == LOW && digitalRead(SENSOR2) == HIGH) {
@@ -70,4 +101,105 @@ void activarServo() {
   miServo.write(anguloReposo);
   delay(500);
   Serial.println("Servo regresó a REPOSO...");
-}
\ No newline at end of file
+}
+
+// Comandos desde el host: 'S' alterna el modo streaming
+void leerComandos() {
+  while (Serial.available() > 0) {
+    char c = Serial.read();
+    if (c == 'S') {
+      if (streaming) {
+        enviarTrama();
+        streaming = false;
+        miServo.write(anguloReposo);
+        faseServo = 0;
+        Serial.println("Streaming DESACTIVADO");
+      } else {
+        Serial.println("Streaming ACTIVADO");
+        streaming = true;
+        numMuestras = 0;
+        ultimoMuestreo = micros();
+      }
+    }
+  }
+}
+
+// Muestreo periódico de sensores; la clasificación la hace el host
+void loopStreaming(bool modo) {
+  unsigned long ahora = micros();
+  if (ahora - ultimoMuestreo >= PERIODO_MUESTREO_US) {
+    if (ahora - ultimoMuestreo >= 2UL * PERIODO_MUESTREO_US) {
+      // ranuras perdidas: cerrar la trama en vez de rellenar con tiempos falsos
+      enviarTrama();
+      ultimoMuestreo = ahora;
+    } else {
+      ultimoMuestreo += PERIODO_MUESTREO_US;
+    }
+    if (numMuestras > 0 && modo != modoTrama) {
+      enviarTrama();  // cada trama lleva un único modo
+    }
+
+    bool s1 = digitalRead(SENSOR1) == LOW;
+    bool s2 = digitalRead(SENSOR2) == LOW;
+
+    if (numMuestras == 0) {
+      t0Trama = ultimoMuestreo;
+      modoTrama = modo;
+      muestraActivacion = SIN_ACTIVACION;
+      memset(bufferMuestras, 0, sizeof(bufferMuestras));
+    }
+
+    // Mismas reglas que el modo normal, pero sin bloquear el muestreo
+    if (faseServo == 0) {
+      if ((modo == HIGH && s1 && !s2) || (modo == LOW && s1 && s2)) {
+        miServo.write(anguloActivo);
+        servoActivadoEn = millis();
+        faseServo = 1;
+        muestraActivacion = numMuestras;
+      }
+    }
+
+    byte bits = (s1 ? 1 : 0) | (s2 ? 2 : 0);
+    bufferMuestras[numMuestras / 4] |= bits << ((numMuestras % 4) * 2);
+    numMuestras++;
+    if (numMuestras == MUESTRAS_POR_TRAMA) {
+      enviarTrama();
+    }
+  }
+  actualizarServo();
+}
+
+void actualizarServo() {
+  unsigned long transcurrido = millis() - servoActivadoEn;
+  if (faseServo == 1 && transcurrido >= 2000) {
+    miServo.write(anguloReposo);
+    faseServo = 2;
+  } else if (faseServo == 2 && transcurrido >= 2500) {
+    faseServo = 0;
+  }
+}
+
+void enviarTrama() {
+  if (numMuestras == 0) {
+    return;
+  }
+  byte estado = (modoTrama == HIGH ? 1 : 0) | (faseServo << 1);
+  byte cabecera[10] = {
+    secuenciaTrama, numMuestras, estado, muestraActivacion,
+    (byte)(t0Trama), (byte)(t0Trama >> 8), (byte)(t0Trama >> 16), (byte)(t0Trama >> 24),
+    (byte)(PERIODO_MUESTREO_US), (byte)(PERIODO_MUESTREO_US >> 8)
+  };
+  byte nBytes = (numMuestras + 3) / 4;
+  byte checksum = 0;
+  for (byte i = 0; i < sizeof(cabecera); i++) checksum ^= cabecera[i];
+  for (byte i = 0; i < nBytes; i++) checksum ^= bufferMuestras[i];
+
+  Serial.write(0xA5);
+  Serial.write(0x5A);
+  Serial.write(cabecera, sizeof(cabecera));
+  Serial.write(bufferMuestras, nBytes);
+  Serial.write(checksum);
+
+  secuenciaTrama++;
+  numMuestras = 0;
+}
@@ -5,13 +5,16 @@ import time
 import threading
 from datetime import datetime
 import random
+import math
+from profiling_tools import Perfilador
+from sensor_stream import DecodificadorStream, ClasificadorStream, COMANDO_STREAMING
 
 # Configuración del tema
 ctk.set_appearance_mode("dark")  # Modo oscuro
 ctk.set_default_color_theme("blue")  # Tema azul
 
 class ClasificadoraModerna:
-    def __init__(self):
+    def __init__(self, directorio_perfiles="perfiles", duracion_perfil=15):
         # Ventana principal
         self.root = ctk.CTk()
         self.root.title("🏭 SISTEMA SCADA - Clasificadora Industrial")
@@ -36,6 +39,16 @@ class ClasificadoraModerna:
         self.historial_produccion = []
         self.max_historial = 20
         
+        # Diagnóstico de rendimiento bajo demanda
+        self.perfilador = Perfilador(directorio_perfiles)
+        self.duracion_perfil = duracion_perfil
+        self.cerrando = False
+        
+        # Streaming de muestras crudas de sensores (clasificación en el host)
+        self.streaming_activo = False
+        self.decodificador = DecodificadorStream()
+        self.clasificador_stream = ClasificadorStream()
+        
         self.start_time = time.time()
         
         # Crear interfaz primero (rápido)
@@ -53,7 +66,8 @@ class ClasificadoraModerna:
         self.log_mensaje("🔄 Inicializando sistema...")
         
         # Conectar hardware en un hilo separado para no bloquear la UI
-        threading.Thread(target=self.conectar_hardware_async, daemon=True).start()
+        threading.Thread(target=self.conectar_hardware_async, name="descubrimiento-serial",
+                         daemon=True).start()
         
         # Iniciar monitoreo con delay para no sobrecargar al inicio
         self.root.after(500, self.iniciar_monitoreo)
@@ -359,6 +373,12 @@ class ClasificadoraModerna:
                                         font=ctk.CTkFont(size=11))
         self.auto_switch.pack(pady=8, padx=15)
         
+        # Switch para streaming de sensores crudos
+        self.stream_switch = ctk.CTkSwitch(advanced_frame, text="Streaming Sensores",
+                                          font=ctk.CTkFont(size=11),
+                                          command=self.toggle_streaming)
+        self.stream_switch.pack(pady=(0, 8), padx=15)
+        
         # Slider para velocidad de simulación
         ctk.CTkLabel(advanced_frame, text="Velocidad Simulación", 
                     font=ctk.CTkFont(size=10)).pack(pady=(8, 0))
@@ -381,6 +401,21 @@ class ClasificadoraModerna:
         self.progress_bar.pack(pady=5, padx=15)
         self.progress_bar.set(0)
         
+        # Diagnóstico de rendimiento
+        ctk.CTkLabel(advanced_frame, text=f"Diagnóstico ({self.duracion_perfil}s)", 
+                    font=ctk.CTkFont(size=10)).pack(pady=(8, 0))
+        
+        perfil_frame = ctk.CTkFrame(advanced_frame, fg_color="transparent")
+        perfil_frame.pack(fill="x", padx=15, pady=5)
+        
+        for texto, tipo in (("🔬 CPU", "hilos"), ("🧠 MEM", "memoria"), ("⏱️ LAG", "lag_tk")):
+            ctk.CTkButton(perfil_frame, text=texto, 
+                         width=72, height=25,
+                         font=ctk.CTkFont(size=9),
+                         fg_color="#8e44ad",
+                         hover_color="#71368a",
+                         command=lambda t=tipo: self.iniciar_perfil(t)).pack(side="left", expand=True, padx=2)
+        
         # Información adicional del sistema
         info_frame = ctk.CTkFrame(advanced_frame)
         info_frame.pack(fill="x", padx=15, pady=10)
@@ -391,6 +426,55 @@ class ClasificadoraModerna:
                     font=ctk.CTkFont(size=8),
                     text_color="gray60").pack()
     
+    def iniciar_perfil(self, tipo, duracion=None):
+        """Lanzar una captura de diagnóstico: 'hilos', 'memoria', 'lag_tk' o 'todo'"""
+        duracion = duracion or self.duracion_perfil
+        if tipo == "todo":
+            # tracemalloc distorsiona el muestreo de pilas: memoria va después de hilos
+            self.iniciar_perfil_tipo("lag_tk", duracion)
+            self.iniciar_perfil_tipo("hilos", duracion, despues="memoria")
+        else:
+            self.iniciar_perfil_tipo(tipo, duracion)
+    
+    def iniciar_perfil_tipo(self, tipo, duracion, despues=None):
+        """Lanzar una captura; `despues` es otra captura a iniciar cuando termine"""
+        def terminado(nombre, ruta, resumen):
+            if self.cerrando:
+                return
+            if ruta is None:
+                self.log_mensaje(f"❌ Error en perfil {nombre}: {resumen.get('error')}")
+            else:
+                datos = ", ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}"
+                                  for k, v in resumen.items())
+                self.log_mensaje(f"🔬 Perfil {nombre} guardado en {ruta} ({datos})")
+            if despues:
+                self.iniciar_perfil_tipo(despues, duracion)
+        
+        try:
+            if tipo == "hilos":
+                self.perfilador.perfilar_hilos(
+                    duracion, al_terminar=lambda r, d: self.programar_ui(terminado, "hilos", r, d))
+            elif tipo == "memoria":
+                self.perfilador.capturar_memoria(
+                    duracion, al_terminar=lambda r, d: self.programar_ui(terminado, "memoria", r, d))
+            elif tipo == "lag_tk":
+                self.perfilador.medir_lag_tk(
+                    self.root, duracion, al_terminar=lambda r, d: terminado("lag Tk", r, d))
+            else:
+                raise ValueError(f"Tipo de perfil desconocido: {tipo}")
+            self.log_mensaje(f"🔬 Perfil {tipo} iniciado ({duracion}s)...")
+        except Exception as e:
+            self.log_mensaje(f"⚠️ No se pudo iniciar perfil {tipo}: {e}")
+    
+    def programar_ui(self, func, *args):
+        """root.after(0, ...) desde hilos secundarios; se ignora si la ventana se está cerrando"""
+        if self.cerrando:
+            return
+        try:
+            self.root.after(0, func, *args)
+        except Exception:
+            pass
+    
     def cambiar_velocidad_sim(self, value):
         self.speed_label.configure(text=f"{int(value)}x")
     
@@ -425,6 +509,9 @@ class ClasificadoraModerna:
     def conectar_hardware(self):
         puertos = ["COM1", "COM2", "COM3", "COM4", "COM5", "COM6"]
         
+        # Reabrir el puerto reinicia el Arduino, que arranca sin streaming
+        self.streaming_activo = False
+        self.root.after(0, self.reset_streaming)
         self.root.after(0, lambda: self.log_mensaje("🔍 Buscando hardware..."))
         
         for puerto in puertos:
@@ -460,20 +547,8 @@ class ClasificadoraModerna:
             try:
                 self.ser.write(b"C\n")
                 time.sleep(0.1)
-                respuesta = ""
-                while self.ser.in_waiting > 0:
-                    linea = self.ser.readline().decode().strip()
-                    if linea:
-                        respuesta = linea
-                        self.log_mensaje(f"Arduino: {linea}")
-                
-                if "Objetos Pequeños" in respuesta:
-                    self.modo_actual = "Objetos Pequeños"
-                    self.label_modo.configure(text="Objetos Pequeños", text_color="#3498db")
-                elif "Objetos Grandes" in respuesta:
-                    self.modo_actual = "Objetos Grandes"
-                    self.label_modo.configure(text="Objetos Grandes", text_color="#e67e22")
-                    
+                # la respuesta puede venir mezclada con tramas de streaming
+                self.leer_serial()
             except Exception as e:
                 self.log_mensaje(f"❌ Error al cambiar modo: {e}")
         else:
@@ -492,7 +567,8 @@ class ClasificadoraModerna:
         if not self.simulacion_activa:
             self.simulacion_activa = True
             self.btn_simular.configure(text="⏹️ DETENER SIMULACIÓN", fg_color="#e74c3c")
-            self.thread_simulacion = threading.Thread(target=self.ejecutar_simulacion, daemon=True)
+            self.thread_simulacion = threading.Thread(target=self.ejecutar_simulacion, name="simulacion",
+                                                      daemon=True)
             self.thread_simulacion.start()
             self.log_mensaje("🎮 Simulación iniciada")
         else:
@@ -542,14 +618,89 @@ class ClasificadoraModerna:
         
         self.root.after(2000, restaurar_servo)
     
+    def toggle_streaming(self):
+        """Pedir al Arduino que alterne el envío de muestras crudas de SENSOR1/SENSOR2"""
+        # el switch solo refleja el estado confirmado por el firmware
+        if self.streaming_activo:
+            self.stream_switch.select()
+        else:
+            self.stream_switch.deselect()
+        if not self.hardware_conectado or not self.ser:
+            self.log_mensaje("⚠️ Streaming requiere hardware conectado")
+            return
+        try:
+            self.ser.write(COMANDO_STREAMING)
+            self.log_mensaje("📡 Solicitando cambio de streaming...")
+        except Exception as e:
+            self.log_mensaje(f"❌ Error al cambiar streaming: {e}")
+    
+    def reset_streaming(self):
+        """Volver al estado sin streaming (p.ej. tras reabrir el puerto)"""
+        self.streaming_activo = False
+        self.stream_switch.deselect()
+        self.decodificador = DecodificadorStream()
+        self.clasificador_stream.reset()
+    
+    def leer_serial(self):
+        """
+        Leer todo lo pendiente del puerto. Tramas de streaming y líneas de texto
+        pasan siempre por el decodificador, así ninguna lectura se come bytes
+        de la otra; las muestras se clasifican por lotes.
+        """
+        t_us, mascaras, lineas = self.decodificador.alimentar(self.ser.read(self.ser.in_waiting))
+        
+        if len(mascaras):
+            self.procesar_muestras(t_us, mascaras)
+        for linea in lineas:
+            self.procesar_mensaje_arduino(linea)
+    
+    def procesar_muestras(self, t_us, mascaras):
+        """Clasificar un lote de muestras y actualizar contadores e indicadores"""
+        dec = self.decodificador
+        if dec.modo_pequenos:
+            self.modo_actual = "Objetos Pequeños"
+            self.label_modo.configure(text="Objetos Pequeños", text_color="#3498db")
+        else:
+            self.modo_actual = "Objetos Grandes"
+            self.label_modo.configure(text="Objetos Grandes", text_color="#e67e22")
+        if dec.fase_servo:
+            self.label_servo.configure(text="ACTIVO", text_color="#27ae60")
+        else:
+            self.label_servo.configure(text="REPOSO", text_color="gray50")
+        
+        objetos = self.clasificador_stream.procesar(t_us, mascaras)
+        if len(objetos["grande"]) == 0:
+            return
+        
+        # solo cuentan los objetos que el servo desvió, como en el modo normal
+        filtrados = objetos["filtrado"]
+        n_grandes = int((objetos["grande"] & filtrados).sum())
+        self.objetos_clasificados["grandes"] += n_grandes
+        self.objetos_clasificados["pequeños"] += int(filtrados.sum()) - n_grandes
+        self.actualizar_estadisticas()
+        
+        for grande, ms, mm, filtrado, perdido in zip(objetos["grande"], objetos["permanencia_ms"],
+                                                     objetos["tamano_mm"], objetos["filtrado"],
+                                                     objetos["perdido"]):
+            tipo = "🔸 GRANDE" if grande else "🔹 PEQUEÑO"
+            if perdido:
+                estado = " ⚠️ PERDIDO (actuador ocupado)"
+            elif filtrado:
+                estado = " - FILTRADO"
+            else:
+                estado = ""
+            tamano = "" if math.isnan(mm) else f", ~{mm:.0f} mm"
+            self.log_mensaje(f"📡 {tipo}: {ms:.0f} ms{tamano}{estado}")
+        # solo se informa si hay una medida real (requiere distancia_sensores_mm)
+        velocidad = self.clasificador_stream.velocidad_cinta_mm_s
+        if velocidad is not None:
+            self.log_mensaje(f"📡 Velocidad cinta (medida): {velocidad:.0f} mm/s")
+    
     def iniciar_monitoreo(self):
         """Monitorear mensajes del hardware y actualizar KPIs"""
         if self.hardware_conectado and self.ser:
             try:
-                while self.ser.in_waiting > 0:
-                    mensaje = self.ser.readline().decode().strip()
-                    if mensaje:
-                        self.procesar_mensaje_arduino(mensaje)
+                self.leer_serial()
             except Exception:
                 pass
         
@@ -581,7 +732,20 @@ class ClasificadoraModerna:
     def procesar_mensaje_arduino(self, mensaje):
         self.log_mensaje(f"Arduino: {mensaje}")
         
-        if "PEQUEÑO" in mensaje:
+        if "Streaming DESACTIVADO" in mensaje:
+            dec = self.decodificador
+            self.log_mensaje(f"📡 Streaming DESACTIVADO - {self.clasificador_stream.perdidos} objetos perdidos, "
+                             f"{dec.tramas_perdidas} tramas perdidas, {dec.muestras_omitidas} muestras omitidas")
+            self.streaming_activo = False
+            self.stream_switch.deselect()
+            # la próxima sesión empieza limpia (la última trama ya se procesó)
+            self.clasificador_stream.reset()
+            dec.nueva_sesion()
+        elif "Streaming ACTIVADO" in mensaje:
+            self.streaming_activo = True
+            self.stream_switch.select()
+            self.log_mensaje("📡 Streaming de sensores ACTIVADO - clasificación en el host")
+        elif "PEQUEÑO" in mensaje:
             self.objetos_clasificados["pequeños"] += 1
             self.actualizar_estadisticas()
         elif "GRANDE" in mensaje:
@@ -591,10 +755,10 @@ class ClasificadoraModerna:
             self.label_servo.configure(text="ACTIVO", text_color="#27ae60")
         elif "Servo regresó a REPOSO" in mensaje:
             self.label_servo.configure(text="REPOSO", text_color="gray50")
-        elif "Objetos Pequeños" in mensaje:
+        elif "Objetos Pequeños" in mensaje or "MODO 1" in mensaje:
             self.modo_actual = "Objetos Pequeños"
             self.label_modo.configure(text="Objetos Pequeños", text_color="#3498db")
-        elif "Objetos Grandes" in mensaje:
+        elif "Objetos Grandes" in mensaje or "MODO 2" in mensaje:
             self.modo_actual = "Objetos Grandes"
             self.label_modo.configure(text="Objetos Grandes", text_color="#e67e22")
     
@@ -627,6 +791,10 @@ class ClasificadoraModerna:
         self.root.mainloop()
     
     def on_closing(self):
+        # dejar que las capturas en curso escriban sus archivos antes de cerrar
+        self.cerrando = True
+        self.perfilador.detener()
+        self.perfilador.esperar(timeout=3)
         if self.simulacion_activa:
             self.simulacion_activa = False
         if self.hardware_conectado and self.ser:
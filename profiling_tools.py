@@ -0,0 +1,251 @@
+# profiling_tools.py
+import itertools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+
+class Perfilador:
+    """
+    Herramientas de diagnóstico bajo demanda para la aplicación en ejecución.
+    Cada captura dura un tiempo acotado y deja sus resultados en disco:
+      - perfilar_hilos:   muestreo de pilas de todos los hilos -> .folded (flamegraph)
+      - capturar_memoria: snapshot + diff de tracemalloc -> .txt, .folded y .snap
+      - medir_lag_tk:     retraso del event loop de Tk -> .csv
+    Uso:
+      p = Perfilador("perfiles")
+      p.perfilar_hilos(10, al_terminar=lambda ruta, resumen: print(ruta))
+      p.medir_lag_tk(root, 10, al_terminar=...)  # llamar desde el hilo de Tk
+      p.detener()                                # cancela capturas en curso
+      p.esperar(timeout=3)                       # antes de cerrar la ventana
+    Los callbacks reciben (ruta, resumen); si la captura falla reciben
+    (None, {"error": mensaje}). Los de perfilar_hilos y capturar_memoria se
+    llaman desde un hilo secundario: usar root.after(0, ...) para tocar la
+    interfaz.
+    Las capturas simultáneas se afectan entre sí: tracemalloc encarece cada
+    asignación y distorsiona el muestreo de pilas, así que conviene no
+    solapar capturar_memoria con perfilar_hilos.
+    """
+    def __init__(self, directorio="perfiles"):
+        self.directorio = directorio
+        self._activos = {}  # tipo -> Event para detener esa captura
+        self._hilos = []
+        self._finalizar_lag = None
+        self._secuencia = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _reservar(self, tipo):
+        with self._lock:
+            if tipo in self._activos:
+                raise RuntimeError(f"Ya hay una captura de {tipo} en curso")
+            evento = threading.Event()
+            self._activos[tipo] = evento
+        return evento
+
+    def _liberar(self, tipo):
+        with self._lock:
+            self._activos.pop(tipo, None)
+
+    def en_curso(self):
+        with self._lock:
+            return sorted(self._activos)
+
+    def detener(self, tipo=None):
+        """
+        Termina antes de tiempo la captura `tipo` o, si es None, todas las que
+        estén en curso (igual escriben lo capturado).
+        """
+        with self._lock:
+            eventos = list(self._activos.values()) if tipo is None else \
+                [self._activos[tipo]] if tipo in self._activos else []
+        for evento in eventos:
+            evento.set()
+
+    def esperar(self, timeout=None):
+        """
+        Espera a que las capturas en curso escriban sus archivos. Debe llamarse
+        desde el hilo de Tk (p.ej. en on_closing, tras detener() y antes de
+        root.destroy()): la medición de lag se cierra aquí mismo porque el
+        event loop ya no volverá a ejecutar su siguiente after.
+        """
+        with self._lock:
+            finalizar_lag = self._finalizar_lag
+            hilos = [h for h in self._hilos if h.is_alive()]
+        if finalizar_lag:
+            finalizar_lag()
+        limite = None if timeout is None else time.monotonic() + timeout
+        for hilo in hilos:
+            hilo.join(None if limite is None else max(0.0, limite - time.monotonic()))
+
+    def _lanzar(self, worker, nombre):
+        hilo = threading.Thread(target=worker, name=nombre, daemon=True)
+        with self._lock:
+            self._hilos = [h for h in self._hilos if h.is_alive()] + [hilo]
+        hilo.start()
+
+    def _ruta(self, prefijo, extension):
+        # milisegundos + contador: dos capturas en el mismo segundo no se pisan
+        os.makedirs(self.directorio, exist_ok=True)
+        marca = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        return os.path.join(self.directorio,
+                            f"{prefijo}_{marca}_{next(self._secuencia)}.{extension}")
+
+    # ------- Muestreo de pilas de todos los hilos -------
+    def perfilar_hilos(self, duracion, intervalo=0.01, al_terminar=None):
+        """
+        Muestrea cada `intervalo` segundos la pila de todos los hilos durante
+        `duracion` segundos. Escribe formato "collapsed stacks" (una pila por
+        línea, frames separados por ';' y el número de muestras al final),
+        listo para flamegraph.pl o speedscope.
+        """
+        detener = self._reservar("hilos")
+
+        def _worker():
+            try:
+                conteos = self._muestrear(duracion, intervalo, detener)
+                ruta = self._ruta("hilos", "folded")
+                with open(ruta, "w", encoding="utf-8") as f:
+                    for pila, n in conteos.most_common():
+                        f.write(f"{pila} {n}\n")
+                resumen = {"muestras": sum(conteos.values()), "pilas": len(conteos)}
+            except Exception as e:
+                ruta, resumen = None, {"error": str(e)}
+            finally:
+                self._liberar("hilos")
+            if al_terminar:
+                al_terminar(ruta, resumen)
+
+        self._lanzar(_worker, "perfilador-hilos")
+
+    def _muestrear(self, duracion, intervalo, detener):
+        propio = threading.get_ident()
+        conteos = Counter()
+        fin = time.perf_counter() + duracion
+        while time.perf_counter() < fin and not detener.is_set():
+            nombres = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == propio:
+                    continue
+                pila = []
+                while frame is not None:
+                    code = frame.f_code
+                    archivo = os.path.basename(code.co_filename)
+                    pila.append(f"{code.co_name} ({archivo}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                pila.append(nombres.get(ident, f"hilo-{ident}"))
+                pila.reverse()
+                conteos[";".join(pila)] += 1
+            time.sleep(intervalo)
+        return conteos
+
+    # ------- Memoria con tracemalloc -------
+    def capturar_memoria(self, duracion, top=25, al_terminar=None):
+        """
+        Toma un snapshot de tracemalloc, espera `duracion` segundos y toma otro.
+        Escribe el diff por línea (.txt), la memoria viva por pila (.folded) y
+        el snapshot final (.snap, cargable con tracemalloc.Snapshot.load).
+        Si tracemalloc no estaba activo se activa solo durante la captura, por
+        lo que el diff refleja lo asignado dentro de la ventana.
+        """
+        detener = self._reservar("memoria")
+
+        def _worker():
+            iniciado_aqui = not tracemalloc.is_tracing()
+            try:
+                if iniciado_aqui:
+                    tracemalloc.start(25)
+                antes = tracemalloc.take_snapshot()
+                detener.wait(duracion)
+                despues = tracemalloc.take_snapshot()
+                pico = tracemalloc.get_traced_memory()[1]
+                if iniciado_aqui:
+                    tracemalloc.stop()
+
+                # all_frames: excluir también lo que el perfilador asigna vía threading.py
+                filtros = [tracemalloc.Filter(False, tracemalloc.__file__),
+                           tracemalloc.Filter(False, __file__, all_frames=True)]
+                antes = antes.filter_traces(filtros)
+                despues = despues.filter_traces(filtros)
+                diff = despues.compare_to(antes, "lineno")
+
+                ruta = self._ruta("memoria", "txt")
+                base = os.path.splitext(ruta)[0]
+                with open(ruta, "w", encoding="utf-8") as f:
+                    f.write(f"# tracemalloc diff ({duracion}s) - pico {pico / 1024:.1f} KiB\n")
+                    for stat in diff[:top]:
+                        f.write(f"{stat}\n")
+                with open(base + ".folded", "w", encoding="utf-8") as f:
+                    for stat in despues.statistics("traceback"):
+                        pila = ";".join(f"{os.path.basename(fr.filename)}:{fr.lineno}"
+                                        for fr in stat.traceback)
+                        f.write(f"{pila} {stat.size}\n")
+                despues.dump(base + ".snap")
+                crecimiento = sum(stat.size_diff for stat in diff)
+                resumen = {"crecimiento_kib": crecimiento / 1024, "pico_kib": pico / 1024}
+            except Exception as e:
+                ruta, resumen = None, {"error": str(e)}
+            finally:
+                if iniciado_aqui and tracemalloc.is_tracing():
+                    tracemalloc.stop()
+                self._liberar("memoria")
+            if al_terminar:
+                al_terminar(ruta, resumen)
+
+        self._lanzar(_worker, "perfilador-memoria")
+
+    # ------- Lag del event loop de Tk -------
+    def medir_lag_tk(self, root, duracion, intervalo_ms=50, al_terminar=None):
+        """
+        Programa un root.after(intervalo_ms) en cadena y mide cuánto tarda de
+        más en ejecutarse cada uno. Debe llamarse desde el hilo de Tk; el
+        callback también se ejecuta en ese hilo. Escribe un CSV tiempo,lag_ms.
+        """
+        detener = self._reservar("lag_tk")
+        muestras = []
+        inicio = time.perf_counter()
+        esperado = [inicio + intervalo_ms / 1000]
+
+        def _tick():
+            if terminado.is_set():
+                return
+            ahora = time.perf_counter()
+            muestras.append((ahora - inicio, max(0.0, ahora - esperado[0]) * 1000))
+            if ahora - inicio < duracion and not detener.is_set():
+                esperado[0] = ahora + intervalo_ms / 1000
+                root.after(intervalo_ms, _tick)
+                return
+            _finalizar()
+
+        def _finalizar():
+            with self._lock:
+                if terminado.is_set():
+                    return
+                terminado.set()
+                self._finalizar_lag = None
+            try:
+                if not muestras:
+                    raise RuntimeError("sin muestras de lag")
+                ruta = self._ruta("lag_tk", "csv")
+                with open(ruta, "w", encoding="utf-8") as f:
+                    f.write("tiempo_s,lag_ms\n")
+                    for t, lag in muestras:
+                        f.write(f"{t:.4f},{lag:.2f}\n")
+                lags = sorted(lag for _, lag in muestras)
+                resumen = {"max_ms": lags[-1],
+                           "p95_ms": lags[int(0.95 * (len(lags) - 1))],
+                           "medio_ms": sum(lags) / len(lags)}
+            except Exception as e:
+                ruta, resumen = None, {"error": str(e)}
+            finally:
+                self._liberar("lag_tk")
+            if al_terminar:
+                al_terminar(ruta, resumen)
+
+        terminado = threading.Event()
+        with self._lock:
+            self._finalizar_lag = _finalizar
+        root.after(intervalo_ms, _tick)
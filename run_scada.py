@@ -6,6 +6,7 @@ Este script asegura que la aplicación se ejecute con la configuración correcta
 """
 
 import sys
+import argparse
 import platform
 
 def configurar_entorno():
@@ -33,8 +34,30 @@ def configurar_entorno():
     except Exception as e:
         print(f"⚠️ No se pudo detectar la resolución: {e}")
 
+def entero_positivo(valor):
+    """Tipo argparse: entero mayor que cero"""
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{valor}' no es un entero")
+    if numero <= 0:
+        raise argparse.ArgumentTypeError(f"debe ser mayor que 0 (recibido {numero})")
+    return numero
+
+def parsear_argumentos():
+    """Leer opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Sistema SCADA - Clasificadora Industrial")
+    parser.add_argument("--perfilar", choices=["hilos", "memoria", "lag_tk", "todo"],
+                        help="Lanzar una captura de diagnóstico al iniciar la aplicación")
+    parser.add_argument("--duracion-perfil", type=entero_positivo, default=15, metavar="SEGUNDOS",
+                        help="Duración de cada captura de diagnóstico (por defecto 15s)")
+    parser.add_argument("--dir-perfiles", default="perfiles", metavar="DIR",
+                        help="Directorio donde se guardan los perfiles (por defecto ./perfiles)")
+    return parser.parse_args()
+
 def main():
     """Función principal"""
+    args = parsear_argumentos()
     configurar_entorno()
     
     # Importar y ejecutar la aplicación
@@ -42,9 +65,15 @@ def main():
         from automation_control import ClasificadoraModerna
         
         print("🏭 Cargando Sistema SCADA...")
-        app = ClasificadoraModerna()
+        app = ClasificadoraModerna(directorio_perfiles=args.dir_perfiles,
+                                   duracion_perfil=args.duracion_perfil)
         app.root.protocol("WM_DELETE_WINDOW", app.on_closing)
         
+        if args.perfilar:
+            print(f"🔬 Perfil '{args.perfilar}' activado ({args.duracion_perfil}s) -> {args.dir_perfiles}/")
+            # Esperar a que arranquen el monitoreo y el descubrimiento serial
+            app.root.after(1000, lambda: app.iniciar_perfil(args.perfilar))
+        
         print("✅ Sistema SCADA iniciado correctamente")
         print("📱 Interfaz optimizada para 1920x1080")
         print("🎮 ¡Listo para operar!")
@@ -0,0 +1,262 @@
+# sensor_stream.py
+import numpy as np
+
+# Formato de trama del firmware en modo streaming (ver classificator_object.ino):
+#   A5 5A | seq | n | estado | activacion | t0_us (uint32 LE) | periodo_us (uint16 LE)
+#         | datos | checksum
+# Cada muestra son 2 bits (bit0 = SENSOR1 activo, bit1 = SENSOR2 activo), 4 por byte.
+# estado: bit0 = switch en MODO 1 (filtrar pequeños), bits1-2 = fase del servo.
+# activacion: índice de la muestra en la que se activó el servo, 0xFF si ninguna.
+SYNC = b"\xa5\x5a"
+LONG_CABECERA = 12
+SIN_ACTIVACION = 0xFF
+COMANDO_STREAMING = b"S\n"
+
+# Bits de cada muestra devuelta por DecodificadorStream
+SENSOR1 = 1
+SENSOR2 = 2
+MODO_PEQUENOS = 4    # el switch estaba en MODO 1 (el servo filtra objetos pequeños)
+SERVO_ACTIVADO = 8   # el servo se activó en esta muestra
+
+_BYTES_CONTROL = bytes(b for b in range(32) if b not in (9, 13))
+
+
+class DecodificadorStream:
+    """
+    Convierte los bytes crudos del puerto serie en muestras de sensores.
+    Los bytes que no forman parte de una trama se devuelven como líneas de
+    texto (p.ej. "Modo cambiado..." o "Streaming DESACTIVADO"), por lo que
+    también sirve para leer el puerto fuera del modo streaming.
+    Uso:
+      dec = DecodificadorStream()
+      t_us, mascaras, lineas = dec.alimentar(ser.read(ser.in_waiting))
+    """
+    def __init__(self):
+        self._buffer = bytearray()
+        self._texto = bytearray()
+        self.nueva_sesion()
+
+    def nueva_sesion(self):
+        """Reiniciar contadores y referencias de tiempo (no descarta bytes pendientes)."""
+        self._ultima_seq = None
+        self._ultimo_t0 = None
+        self._t_siguiente = None
+        self._desborde_t0 = 0
+        self.tramas = 0
+        self.tramas_perdidas = 0
+        self.tramas_invalidas = 0
+        self.muestras_omitidas = 0
+        self.modo_pequenos = None
+        self.fase_servo = 0
+
+    def alimentar(self, datos):
+        """
+        Procesa los bytes recibidos y devuelve (t_us, mascaras, lineas):
+        t_us int64 con el instante de cada muestra (micros() sin desborde),
+        mascaras uint8 con los bits SENSOR1/SENSOR2/MODO_PEQUENOS/SERVO_ACTIVADO
+        y las líneas de texto completas.
+        """
+        self._buffer.extend(datos)
+        tiempos, mascaras = [], []
+
+        while True:
+            inicio = self._buffer.find(SYNC)
+            if inicio < 0:
+                # conservar un posible byte de sync partido entre lecturas
+                corte = len(self._buffer) - 1 if self._buffer.endswith(SYNC[:1]) else len(self._buffer)
+                self._texto.extend(self._buffer[:corte])
+                del self._buffer[:corte]
+                break
+            self._texto.extend(self._buffer[:inicio])
+            del self._buffer[:inicio]
+            if len(self._buffer) < LONG_CABECERA:
+                break
+
+            n = self._buffer[3]
+            largo = LONG_CABECERA + (n + 3) // 4 + 1
+            if len(self._buffer) < largo:
+                break
+            trama = np.frombuffer(bytes(self._buffer[2:largo]), dtype=np.uint8)
+            if n == 0 or np.bitwise_xor.reduce(trama[:-1]) != trama[-1]:
+                # falso sync o trama corrupta: descartar solo los bytes que
+                # ocupaba (o hasta el siguiente sync) para no perder el texto
+                # que el firmware envía justo detrás
+                self.tramas_invalidas += 1
+                siguiente = self._buffer.find(SYNC, 1, largo)
+                del self._buffer[:largo if siguiente < 0 else siguiente]
+                continue
+            del self._buffer[:largo]
+            tiempos_trama, mascaras_trama = self._decodificar(trama)
+            tiempos.append(tiempos_trama)
+            mascaras.append(mascaras_trama)
+
+        lineas = []
+        while b"\n" in self._texto:
+            linea, _, resto = bytes(self._texto).partition(b"\n")
+            self._texto = bytearray(resto)
+            if any(b in _BYTES_CONTROL for b in linea):
+                continue  # restos binarios (p.ej. un falso sync)
+            texto = linea.decode("utf-8", errors="ignore").strip()
+            if texto:
+                lineas.append(texto)
+
+        if not mascaras:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint8), lineas
+        return np.concatenate(tiempos), np.concatenate(mascaras), lineas
+
+    def _decodificar(self, trama):
+        seq, n, estado, activacion = (int(b) for b in trama[:4])
+        t0 = int.from_bytes(trama[4:8].tobytes(), "little")
+        periodo = int.from_bytes(trama[8:10].tobytes(), "little")
+
+        if self._ultimo_t0 is not None and t0 < self._ultimo_t0:
+            self._desborde_t0 += 1 << 32
+        self._ultimo_t0 = t0
+        t0 += self._desborde_t0
+        if self._ultima_seq is not None:
+            self.tramas_perdidas += (seq - self._ultima_seq - 1) % 256
+        self._ultima_seq = seq
+        if self._t_siguiente is not None and periodo and t0 - self._t_siguiente >= periodo:
+            # el firmware no rellena huecos: empieza trama nueva con su t0
+            self.muestras_omitidas += (t0 - self._t_siguiente) // periodo
+        self._t_siguiente = t0 + n * periodo
+        self.tramas += 1
+        self.modo_pequenos = bool(estado & 1)
+        self.fase_servo = (estado >> 1) & 3
+
+        datos = trama[10:-1]
+        bits = np.stack([(datos >> desp) & 3 for desp in (0, 2, 4, 6)], axis=1).ravel()[:n]
+        if self.modo_pequenos:
+            bits |= MODO_PEQUENOS
+        if activacion < n:
+            bits[activacion] |= SERVO_ACTIVADO
+        return t0 + periodo * np.arange(n, dtype=np.int64), bits
+
+
+def regla_por_sensores(objetos):
+    """Regla del firmware: es grande si SENSOR2 se activó durante el paso del objeto."""
+    return objetos["sensor2"]
+
+
+class ClasificadorStream:
+    """
+    Detección de flancos y clasificación por lotes sobre las muestras crudas.
+    Un objeto es un tramo continuo con SENSOR1 activo. Para cada objeto se
+    obtiene el tiempo de permanencia, si activó SENSOR2, el tamaño estimado
+    (solo con geometría configurada), si cumplía la regla del firmware para el
+    modo del switch ("objetivo"), si el servo se activó durante su paso
+    ("filtrado") y si se perdió (objetivo pero no filtrado, porque el servo
+    seguía ocupado con el anterior).
+
+    distancia_sensores_mm: separación a lo largo de la cinta con SENSOR2
+        aguas abajo de SENSOR1. Con ella se estima la velocidad a partir del
+        retardo entre sus flancos en los objetos grandes. None (por defecto)
+        significa sin estimación: con el montaje del firmware, ambos sensores
+        en la misma posición a distinta altura, no hay retardo que medir y
+        velocidad_cinta_mm_s / tamano_mm quedan en None / NaN.
+    regla: función(objetos) -> array bool "es grande"; permite cambiar la
+        clasificación sin reprogramar el Arduino.
+    """
+    def __init__(self, distancia_sensores_mm=None, regla=regla_por_sensores):
+        self.distancia_sensores_mm = distancia_sensores_mm
+        self.regla = regla
+        self.reset()
+
+    def reset(self):
+        self.velocidad_cinta_mm_s = None  # solo medida, nunca supuesta
+        self._s1_prev = 0
+        self._s2_prev = 0
+        self._abierto = None   # dict con lo acumulado del objeto en curso
+        self.perdidos = 0
+
+    def procesar(self, t_us, mascaras):
+        """
+        Procesa un lote de muestras y devuelve un dict de arrays con los
+        objetos que terminaron de pasar en este lote (vacío si ninguno).
+        """
+        objetos = self._detectar_objetos(np.asarray(t_us, dtype=np.int64),
+                                         np.asarray(mascaras, dtype=np.uint8))
+        n = len(objetos["t_inicio_us"])
+
+        # velocidad a partir del retardo entre sensores (solo objetos grandes)
+        retardo_us = objetos["t_sensor2_us"] - objetos["t_inicio_us"]
+        validos = objetos["sensor2"] & (objetos["t_sensor2_us"] >= 0) & (retardo_us > 0)
+        if validos.any() and self.distancia_sensores_mm:
+            self.velocidad_cinta_mm_s = float(np.median(
+                self.distancia_sensores_mm / (retardo_us[validos] / 1e6)))
+        velocidad = np.nan if self.velocidad_cinta_mm_s is None else self.velocidad_cinta_mm_s
+        objetos["velocidad_mm_s"] = np.full(n, velocidad)
+        objetos["tamano_mm"] = objetos["permanencia_ms"] / 1000 * velocidad
+        objetos["grande"] = np.asarray(self.regla(objetos), dtype=bool)
+        objetos["perdido"] = objetos["objetivo"] & ~objetos["filtrado"]
+        self.perdidos += int(objetos["perdido"].sum())
+        return objetos
+
+    def _detectar_objetos(self, t_us, mascaras):
+        if len(mascaras) == 0:
+            return {"t_inicio_us": np.empty(0, dtype=np.int64),
+                    "permanencia_ms": np.empty(0),
+                    "t_sensor2_us": np.empty(0, dtype=np.int64),
+                    "sensor2": np.empty(0, dtype=bool),
+                    "objetivo": np.empty(0, dtype=bool),
+                    "filtrado": np.empty(0, dtype=bool)}
+
+        s1 = (mascaras & SENSOR1) > 0
+        s2 = (mascaras & SENSOR2) > 0
+        modo_pequenos = (mascaras & MODO_PEQUENOS) > 0
+        banderas = {"sensor2": s2,
+                    # misma condición que dispara el servo en el firmware
+                    "objetivo": s1 & np.where(modo_pequenos, ~s2, s2),
+                    "filtrado": (mascaras & SERVO_ACTIVADO) > 0}
+        acum = {k: np.concatenate(([0], np.cumsum(v))) for k, v in banderas.items()}
+
+        d1 = np.diff(s1.astype(np.int8), prepend=np.int8(self._s1_prev))
+        subidas2 = np.flatnonzero(np.diff(s2.astype(np.int8), prepend=np.int8(self._s2_prev)) == 1)
+        self._s1_prev, self._s2_prev = int(s1[-1]), int(s2[-1])
+        subidas = np.flatnonzero(d1 == 1)
+        bajadas = np.flatnonzero(d1 == -1)
+
+        def resumir(desde, hasta):
+            # banderas vistas en [desde, hasta) y primer flanco de SENSOR2 (-1 si no hay)
+            r = {k: (a[hasta] - a[desde]) > 0 for k, a in acum.items()}
+            if len(subidas2) == 0:
+                r["t_sensor2_us"] = np.full(len(desde), -1, dtype=np.int64)
+            else:
+                idx = np.searchsorted(subidas2, desde)
+                idx_ok = np.minimum(idx, len(subidas2) - 1)
+                hay = (idx < len(subidas2)) & (subidas2[idx_ok] < hasta)
+                r["t_sensor2_us"] = np.where(hay, t_us[subidas2[idx_ok]], -1).astype(np.int64)
+            return r
+
+        # objeto que venía abierto de lotes anteriores
+        previo = None
+        if self._abierto is not None:
+            fin = bajadas[0] if len(bajadas) else len(s1)
+            parcial = resumir(np.array([0]), np.array([fin]))
+            for k in banderas:
+                self._abierto[k] = self._abierto[k] or bool(parcial[k][0])
+            if self._abierto["t_sensor2_us"] < 0:
+                self._abierto["t_sensor2_us"] = int(parcial["t_sensor2_us"][0])
+            if len(bajadas):
+                previo = self._abierto
+                previo["permanencia_ms"] = (t_us[fin] - previo["t_inicio_us"]) / 1000
+                bajadas = bajadas[1:]
+                self._abierto = None
+
+        # objetos completos dentro del lote
+        inicios = subidas[:len(bajadas)]
+        objetos = resumir(inicios, bajadas)
+        objetos["t_inicio_us"] = t_us[inicios]
+        objetos["permanencia_ms"] = (t_us[bajadas] - t_us[inicios]) / 1000
+
+        # objeto que queda abierto para el siguiente lote
+        if len(subidas) > len(bajadas):
+            ini = subidas[len(bajadas)]
+            r = resumir(np.array([ini]), np.array([len(s1)]))
+            self._abierto = {k: v[0].item() for k, v in r.items()}
+            self._abierto["t_inicio_us"] = int(t_us[ini])
+
+        if previo is not None:
+            objetos = {k: np.concatenate(([previo[k]], v)).astype(v.dtype)
+                       for k, v in objetos.items()}
+        return objetos
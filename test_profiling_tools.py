@@ -0,0 +1,90 @@
+import os
+import queue
+import re
+import threading
+import time
+
+import pytest
+
+from profiling_tools import Perfilador
+
+
+class RootFalso:
+    """Sustituto de Tk: ejecuta cada after() en un Timer."""
+    def after(self, ms, func, *args):
+        threading.Timer(ms / 1000, func, args).start()
+
+
+def esperar_resultado(cola):
+    return cola.get(timeout=10)
+
+
+def test_perfilar_hilos_escribe_collapsed_stacks(tmp_path):
+    detener = threading.Event()
+    hilo = threading.Thread(target=detener.wait, name="simulacion")
+    hilo.start()
+    resultados = queue.Queue()
+    try:
+        Perfilador(str(tmp_path)).perfilar_hilos(
+            0.2, al_terminar=lambda ruta, resumen: resultados.put((ruta, resumen)))
+        ruta, resumen = esperar_resultado(resultados)
+    finally:
+        detener.set()
+        hilo.join()
+
+    lineas = open(ruta, encoding="utf-8").read().splitlines()
+    assert resumen["muestras"] > 0 and len(lineas) == resumen["pilas"]
+    # "hilo;frame;frame ... cuenta"
+    assert all(re.fullmatch(r"[^;]+(;[^;]+)+ \d+", linea) for linea in lineas)
+    assert any(linea.startswith("simulacion;") for linea in lineas)
+
+
+def test_rechaza_segunda_captura_del_mismo_tipo(tmp_path):
+    perfilador = Perfilador(str(tmp_path))
+    resultados = queue.Queue()
+    perfilador.perfilar_hilos(5, al_terminar=lambda *a: resultados.put(a))
+
+    with pytest.raises(RuntimeError):
+        perfilador.perfilar_hilos(5)
+    assert perfilador.en_curso() == ["hilos"]
+
+    perfilador.detener("hilos")
+    esperar_resultado(resultados)
+    assert perfilador.en_curso() == []
+
+
+def test_error_de_escritura_llega_al_callback(tmp_path):
+    archivo = tmp_path / "no_es_directorio"
+    archivo.write_text("")
+    resultados = queue.Queue()
+
+    Perfilador(str(archivo)).perfilar_hilos(0.05, al_terminar=lambda *a: resultados.put(a))
+
+    ruta, resumen = esperar_resultado(resultados)
+    assert ruta is None and "error" in resumen
+
+
+def test_medir_lag_tk_con_root_falso(tmp_path):
+    resultados = queue.Queue()
+    Perfilador(str(tmp_path)).medir_lag_tk(RootFalso(), 0.2, intervalo_ms=20,
+                                           al_terminar=lambda *a: resultados.put(a))
+
+    ruta, resumen = esperar_resultado(resultados)
+    lineas = open(ruta, encoding="utf-8").read().splitlines()
+    assert lineas[0] == "tiempo_s,lag_ms" and len(lineas) > 2
+    assert 0 <= resumen["medio_ms"] <= resumen["max_ms"]
+
+
+def test_esperar_cierra_lag_y_nombres_no_se_pisan(tmp_path):
+    perfilador = Perfilador(str(tmp_path))
+    rutas = []
+    for _ in range(2):
+        perfilador.medir_lag_tk(RootFalso(), 60, intervalo_ms=10,
+                                al_terminar=lambda ruta, resumen: rutas.append(ruta))
+        time.sleep(0.1)
+        # como en on_closing: el event loop ya no correrá, esperar() cierra la captura
+        perfilador.detener()
+        perfilador.esperar(timeout=1)
+
+    assert len(rutas) == 2 and all(os.path.exists(r) for r in rutas)
+    assert rutas[0] != rutas[1]
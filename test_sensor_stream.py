@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+
+from sensor_stream import (ClasificadorStream, DecodificadorStream, MODO_PEQUENOS,
+                           SERVO_ACTIVADO, SIN_ACTIVACION, SYNC)
+
+
+def trama(seq, t0, muestras, periodo=1000, modo_pequenos=True, activacion=SIN_ACTIVACION):
+    """Construir una trama igual que enviarTrama() del firmware."""
+    datos = bytearray((len(muestras) + 3) // 4)
+    for i, bits in enumerate(muestras):
+        datos[i // 4] |= bits << ((i % 4) * 2)
+    cabecera = bytes([seq, len(muestras), int(modo_pequenos), activacion])
+    cabecera += (t0 % (1 << 32)).to_bytes(4, "little") + periodo.to_bytes(2, "little")
+    checksum = 0
+    for b in cabecera + datos:
+        checksum ^= b
+    return SYNC + cabecera + bytes(datos) + bytes([checksum])
+
+
+def test_decodifica_muestras_y_texto():
+    dec = DecodificadorStream()
+    datos = b"Streaming ACTIVADO\r\n" + trama(0, 5000, [0, 1, 3, 2, 1], activacion=1)
+    t_us, mascaras, lineas = dec.alimentar(datos)
+
+    assert lineas == ["Streaming ACTIVADO"]
+    assert t_us.tolist() == [5000, 6000, 7000, 8000, 9000]
+    assert (mascaras & 3).tolist() == [0, 1, 3, 2, 1]
+    assert (mascaras & MODO_PEQUENOS).all()
+    assert ((mascaras & SERVO_ACTIVADO) > 0).tolist() == [False, True, False, False, False]
+    assert dec.tramas == 1
+
+
+def test_trama_partida_entre_lecturas():
+    dec = DecodificadorStream()
+    datos = trama(0, 0, [1] * 10)
+    t1, _, _ = dec.alimentar(datos[:1])
+    t2, m2, _ = dec.alimentar(datos[1:])
+    assert len(t1) == 0
+    assert len(t2) == 10 and (m2 & 1).all()
+
+
+def test_checksum_invalido_resincroniza_sin_basura_en_texto():
+    dec = DecodificadorStream()
+    corrupta = bytearray(trama(0, 0, [1] * 8))
+    corrupta[-2] ^= 0xFF
+    t_us, _, lineas = dec.alimentar(bytes(corrupta) + trama(1, 8000, [2] * 4) + b"ok\r\n")
+
+    assert lineas == ["ok"]
+    assert t_us.tolist() == [8000, 9000, 10000, 11000]
+    assert dec.tramas_invalidas == 1
+
+
+def test_cuenta_tramas_perdidas_y_muestras_omitidas():
+    dec = DecodificadorStream()
+    dec.alimentar(trama(254, 0, [0] * 4))
+    dec.alimentar(trama(1, 4000, [0] * 4))      # faltan seq 255 y 0
+    dec.alimentar(trama(2, 12000, [0] * 4))     # hueco de 4 muestras
+    assert dec.tramas_perdidas == 2
+    assert dec.muestras_omitidas == 4
+
+
+def test_desborde_de_micros():
+    dec = DecodificadorStream()
+    t0 = (1 << 32) - 2000
+    t_us, _, _ = dec.alimentar(trama(0, t0, [0] * 4) + trama(1, t0 + 4000, [0] * 4))
+    assert np.all(np.diff(t_us) == 1000)
+    assert t_us[-1] == (1 << 32) + 5000
+
+
+def test_objeto_abierto_entre_varios_lotes():
+    dec = DecodificadorStream()
+    clasificador = ClasificadorStream(distancia_sensores_mm=20)
+    # objeto grande: SENSOR1 de la muestra 2 a la 9, SENSOR2 desde la 4
+    muestras = [0, 0, 1, 1, 3, 3, 3, 3, 3, 1, 0, 0]
+    lotes = [trama(i, i * 4000, muestras[i * 4:i * 4 + 4], modo_pequenos=False,
+                   activacion=0 if i == 1 else SIN_ACTIVACION) for i in range(3)]
+
+    resultados = []
+    for datos in lotes:
+        t_us, mascaras, _ = dec.alimentar(datos)
+        resultados.append(clasificador.procesar(t_us, mascaras))
+
+    assert [len(r["t_inicio_us"]) for r in resultados] == [0, 0, 1]
+    objeto = {k: v[0] for k, v in resultados[2].items()}
+    assert objeto["t_inicio_us"] == 2000
+    assert objeto["permanencia_ms"] == pytest.approx(8.0)
+    assert objeto["grande"] and objeto["filtrado"] and not objeto["perdido"]
+    assert objeto["velocidad_mm_s"] == pytest.approx(20 / 0.002)
+
+
+def test_objeto_objetivo_sin_activacion_es_perdido():
+    clasificador = ClasificadorStream()
+    t_us = np.arange(12, dtype=np.int64) * 1000
+    mascaras = np.array([0, 1, 1, 0, 0, 1, 1, 0, 0, 3, 3, 0], dtype=np.uint8) | MODO_PEQUENOS
+    mascaras[1] |= SERVO_ACTIVADO
+
+    objetos = clasificador.procesar(t_us, mascaras)
+
+    assert objetos["filtrado"].tolist() == [True, False, False]
+    assert objetos["perdido"].tolist() == [False, True, False]
+    assert objetos["grande"].tolist() == [False, False, True]
+    assert clasificador.perdidos == 1
+
+
+def test_trama_corrupta_seguida_de_linea_de_estado():
+    dec = DecodificadorStream()
+    corrupta = bytearray(trama(5, 0, [1] * 8))
+    corrupta[-2] ^= 0xFF
+    t_us, _, lineas = dec.alimentar(bytes(corrupta) + b"Streaming DESACTIVADO\r\n")
+
+    assert len(t_us) == 0
+    assert lineas == ["Streaming DESACTIVADO"]
+    assert dec.tramas_invalidas == 1
+
+
+def test_geometria_del_firmware_sin_estimacion_de_velocidad():
+    # montaje real: ambos sensores en la misma posición, SENSOR2 más alto;
+    # un objeto grande activa los dos en la misma muestra
+    clasificador = ClasificadorStream()
+    t_us = np.arange(14, dtype=np.int64) * 1000
+    mascaras = np.array([0, 3, 3, 3, 3, 0, 0, 1, 1, 1, 0, 0, 3, 0], dtype=np.uint8) | MODO_PEQUENOS
+    mascaras[7] |= SERVO_ACTIVADO
+
+    objetos = clasificador.procesar(t_us, mascaras)
+
+    assert objetos["grande"].tolist() == [True, False, True]
+    # en MODO 1 (S1 && !S2) los grandes nunca disparan el servo
+    assert objetos["objetivo"].tolist() == [False, True, False]
+    assert objetos["perdido"].tolist() == [False, False, False]
+    assert objetos["permanencia_ms"].tolist() == [4.0, 3.0, 1.0]
+    assert clasificador.velocidad_cinta_mm_s is None
+    assert np.isnan(objetos["tamano_mm"]).all()